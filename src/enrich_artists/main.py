@@ -5,6 +5,7 @@ import json
 
 from google.cloud import bigquery
 from google.cloud import secretmanager
+from google.cloud import storage
 from dotenv import load_dotenv
 import functions_framework
 import datetime
@@ -13,6 +14,7 @@ import datetime
 load_dotenv() # Load .env file for local execution
 
 GCP_PROJECT_ID = os.environ.get("GCP_PROJECT_ID")
+GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
 BQ_DATASET_ID = os.environ.get("BQ_DATASET_ID")
 DIM_ARTISTS_TABLE_ID = os.environ.get("DIM_ARTISTS_TABLE_ID") 
 STG_TRACKS_TABLE_ID = os.environ.get("STG_TRACKS_TABLE_ID") 
@@ -21,6 +23,10 @@ STG_TRACKS_TABLE_ID = os.environ.get("STG_TRACKS_TABLE_ID")
 DIM_ARTISTS_TABLE_FULL_ID = f"{GCP_PROJECT_ID}.{BQ_DATASET_ID}.{DIM_ARTISTS_TABLE_ID}"
 STG_TRACKS_TABLE_FULL_ID = f"{GCP_PROJECT_ID}.{BQ_DATASET_ID}.{STG_TRACKS_TABLE_ID}"
 
+# Raw copy of every /artists response merged into dim_artists, so the rows can be replayed
+# outside BigQuery (e.g. by src/local_analytics). Not matched by the raw_spotify_* external tables.
+GCS_ENRICHED_ARTISTS_PREFIX = "spotify/raw/enriched_artists"
+
 # Secret Manager Secret IDs
 SPOTIFY_CLIENT_ID_SECRET_NAME = "spotify-client-id"
 SPOTIFY_CLIENT_SECRET_SECRET_NAME = "spotify-client-secret"
@@ -33,6 +39,7 @@ SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
 
 # Initiliase clients
 secret_manager_client = secretmanager.SecretManagerServiceClient()
+storage_client = storage.Client()
 bq_client = bigquery.Client(project=GCP_PROJECT_ID)
 
 def get_secret(secret_id):
@@ -121,6 +128,27 @@ def fetch_spotify_artist_details(access_token, artist_ids):
         print(f"\nAn unexpected error occurred fetching artist details: {e}")
         return [] # Return empty list on unexpected error
 
+def upload_artists_to_gcs(artists_data, latest_snapshot_date):
+    """Uploads fetched artist objects as NDJSON, partitioned by the snapshot date they are merged for."""
+    if not GCS_BUCKET_NAME:
+        raise ValueError("GCS_BUCKET_NAME environment variable not set.")
+    valid_artists = [artist for artist in artists_data if artist and 'id' in artist]
+    if not valid_artists:
+        print("No artist data provided to upload to GCS.")
+        return None
+
+    partition = f"year={latest_snapshot_date:%Y}/month={latest_snapshot_date:%m}/day={latest_snapshot_date:%d}"
+    timestamp_suffix = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    blob_name = f"{GCS_ENRICHED_ARTISTS_PREFIX}/{partition}/enriched_artists_{timestamp_suffix}.json"
+    ndjson_string = "\n".join(json.dumps(artist, separators=(',', ':')) for artist in valid_artists) + "\n"
+    try:
+        storage_client.bucket(GCS_BUCKET_NAME).blob(blob_name).upload_from_string(ndjson_string, content_type='application/json')
+        print(f"Successfully uploaded {len(valid_artists)} artists to gs://{GCS_BUCKET_NAME}/{blob_name}")
+        return blob_name
+    except Exception as e:
+        print(f"Error uploading artists to GCS bucket {GCS_BUCKET_NAME}: {e}")
+        raise RuntimeError("Failed to upload artist data to GCS") from e
+
 def merge_artists_to_bq(artists_data, latest_snapshot_date):
     """Merges fetched artist data into the BigQuery dim_artists table using parallel arrays."""
     if not artists_data:
@@ -164,7 +192,7 @@ def merge_artists_to_bq(artists_data, latest_snapshot_date):
         id AS artist_id,
         name AS artist_name,
         pop AS artist_popularity,
-        JSON_QUERY_ARRAY(genres) AS artist_genres, 
+        JSON_VALUE_ARRAY(genres) AS artist_genres, 
         uri AS artist_uri,
         img AS artist_image_url, 
         snap_date AS last_seen_artist_snapshot_date_str
@@ -297,8 +325,10 @@ def enrich_artists_http(request):
 
             fetched_artist_details = fetch_spotify_artist_details(access_token, artists_to_fetch)
 
-            # 6. Merge fetched details into BigQuery
+            # 6. Land the raw responses, then merge fetched details into BigQuery
+            #    (uploading first means a failed upload is retried next run instead of being lost)
             if fetched_artist_details:
+                upload_artists_to_gcs(fetched_artist_details, latest_snapshot_date)
                 merge_artists_to_bq(fetched_artist_details, latest_snapshot_date)
             else:
                 print("No details fetched from Spotify API, skipping BQ merge.")
@@ -0,0 +1,558 @@
+import base64
+import functools
+import os
+import time
+import json
+import warnings
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from google.cloud import bigquery
+from google.cloud import secretmanager
+from google.cloud import storage
+from dotenv import load_dotenv
+import functions_framework
+
+# --- Configuration ---
+load_dotenv() # Load .env file for local execution
+
+GCP_PROJECT_ID = os.environ.get("GCP_PROJECT_ID")
+GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
+BQ_DATASET_ID = os.environ.get("BQ_DATASET_ID")
+STG_TRACKS_TABLE_ID = os.environ.get("STG_TRACKS_TABLE_ID")
+AUDIO_FEATURES_TABLE_ID = os.environ.get("AUDIO_FEATURES_TABLE_ID")
+
+# Construct full BQ table IDs
+STG_TRACKS_TABLE_FULL_ID = f"{GCP_PROJECT_ID}.{BQ_DATASET_ID}.{STG_TRACKS_TABLE_ID}"
+AUDIO_FEATURES_TABLE_FULL_ID = f"{GCP_PROJECT_ID}.{BQ_DATASET_ID}.{AUDIO_FEATURES_TABLE_ID}"
+
+# Secret Manager Secret IDs
+SPOTIFY_CLIENT_ID_SECRET_NAME = "spotify-client-id"
+SPOTIFY_CLIENT_SECRET_SECRET_NAME = "spotify-client-secret"
+SPOTIFY_REFRESH_TOKEN_SECRET_NAME = "spotify-refresh-token"
+SECRET_VERSION = "latest"
+
+# Spotify API Config
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
+AUDIO_FEATURES_BATCH_SIZE = 100 # Max IDs accepted by GET /audio-features
+MAX_CONCURRENT_REQUESTS = 4
+
+# Feature store config
+# The store is memory-mapped from local disk and mirrored to GCS so that it survives cold starts
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "/tmp/audio_feature_store")
+FEATURE_STORE_GCS_PREFIX = "spotify/features/audio_features"
+TRACK_IDS_FILE = "track_ids.npy"
+FEATURES_FILE = "features.npy"
+UNAVAILABLE_IDS_FILE = "unavailable_track_ids.npy"
+
+# Column order of the feature matrix; also the column order of the BQ mirror table
+AUDIO_FEATURE_COLUMNS = [
+    "danceability",
+    "energy",
+    "key",
+    "loudness",
+    "mode",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+    "time_signature",
+]
+# Continuous features used for snapshot-to-snapshot drift (key/mode/time_signature are categorical)
+DRIFT_FEATURE_COLUMNS = [
+    "danceability",
+    "energy",
+    "loudness",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+]
+
+# Clients are created on first use, so the store and aggregates import without GCP credentials (e.g. in tests)
+@functools.lru_cache(maxsize=None)
+def get_secret_manager_client():
+    return secretmanager.SecretManagerServiceClient()
+
+@functools.lru_cache(maxsize=None)
+def get_storage_client():
+    return storage.Client()
+
+@functools.lru_cache(maxsize=None)
+def get_bq_client():
+    return bigquery.Client(project=GCP_PROJECT_ID)
+
+def get_secret(secret_id):
+    """Fetches a secret value from Google Cloud Secret Manager."""
+    if not GCP_PROJECT_ID:
+        raise ValueError("GCP_PROJECT_ID environment variable not set.")
+    name = f"projects/{GCP_PROJECT_ID}/secrets/{secret_id}/versions/{SECRET_VERSION}"
+    try:
+        response = get_secret_manager_client().access_secret_version(request={"name": name})
+        payload = response.payload.data.decode("UTF-8")
+        print(f"Successfully accessed secret: {secret_id}")
+        return payload
+    except Exception as e:
+        print(f"Error accessing secret {secret_id}: {e}")
+        raise RuntimeError(f"Failed to access secret {secret_id}") from e
+
+def refresh_spotify_access_token(client_id, client_secret, refresh_token):
+    """Gets a new access token from Spotify using a refresh token."""
+    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode("utf-8")).decode("utf-8")
+    payload = {
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+    }
+    headers = {"Authorization": f"Basic {auth_header}"}
+    try:
+        response = requests.post(SPOTIFY_TOKEN_URL, headers=headers, data=payload, timeout=10)
+        response.raise_for_status()
+        token_info = response.json()
+        print("Successfully refreshed Spotify access token.")
+        return token_info.get("access_token")
+    except requests.exceptions.RequestException as e:
+        print(f"Error refreshing Spotify token: {e}")
+        if response is not None: print(f"Response status: {response.status_code}, Response text: {response.text}")
+        raise RuntimeError("Failed to refresh Spotify token") from e
+
+
+# --- Feature Store ---
+class AudioFeatureStore:
+    """
+    Columnar, NumPy-backed store of per-track audio features.
+
+    Features live in a single float32 matrix (one row per track, one column per
+    entry in AUDIO_FEATURE_COLUMNS) saved as .npy and opened with mmap_mode, so
+    aggregates only page in the rows they touch. Missing values are stored as NaN.
+    Tracks Spotify has no audio features for are kept in a separate ID list so
+    they are not requested again on every run.
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.track_ids_path = os.path.join(base_dir, TRACK_IDS_FILE)
+        self.features_path = os.path.join(base_dir, FEATURES_FILE)
+        self.unavailable_ids_path = os.path.join(base_dir, UNAVAILABLE_IDS_FILE)
+        self.track_ids = np.empty(0, dtype="<U22")
+        self.features = np.empty((0, len(AUDIO_FEATURE_COLUMNS)), dtype=np.float32)
+        self.unavailable_ids = set()
+        self._row_index = {}
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def __contains__(self, track_id):
+        return track_id in self._row_index
+
+    def _file_paths(self):
+        """Maps store file names to their local paths (the unavailable ID list is optional)."""
+        return {
+            TRACK_IDS_FILE: self.track_ids_path,
+            FEATURES_FILE: self.features_path,
+            UNAVAILABLE_IDS_FILE: self.unavailable_ids_path,
+        }
+
+    def load(self):
+        """Opens the store from local disk (features are memory-mapped, not read)."""
+        if os.path.exists(self.unavailable_ids_path):
+            self.unavailable_ids = set(np.load(self.unavailable_ids_path).tolist())
+        if not (os.path.exists(self.track_ids_path) and os.path.exists(self.features_path)):
+            print(f"No local feature store found in {self.base_dir}, starting empty.")
+            return self
+        self.track_ids = np.load(self.track_ids_path)
+        self.features = np.load(self.features_path, mmap_mode="r")
+        self._row_index = {track_id: row for row, track_id in enumerate(self.track_ids.tolist())}
+        print(f"Loaded feature store with {len(self)} tracks ({len(self.unavailable_ids)} unavailable) from {self.base_dir}.")
+        return self
+
+    def _save(self, arrays):
+        """Writes {path: array} to temporary files first so a failed run never leaves a half-written store behind."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        for path, array in arrays.items():
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(f"{path}.tmp", path)
+
+    def missing(self, track_ids):
+        """Returns the track IDs (in input order, de-duplicated) that are neither stored nor known to be unavailable."""
+        return list(dict.fromkeys(
+            track_id for track_id in track_ids
+            if track_id and track_id not in self and track_id not in self.unavailable_ids
+        ))
+
+    def rows_for(self, track_ids):
+        """Returns the row indices of the given track IDs, skipping unknown tracks."""
+        return np.fromiter(
+            (self._row_index[track_id] for track_id in track_ids if track_id in self._row_index),
+            dtype=np.int64,
+        )
+
+    def append(self, audio_features_data):
+        """Appends Spotify audio-features objects to the store and persists it. Returns the number of rows added."""
+        new_ids = []
+        new_rows = []
+        seen_ids = set()
+        for features in audio_features_data:
+            if not features or not features.get("id"): continue
+            if features["id"] in self or features["id"] in seen_ids: continue
+            seen_ids.add(features["id"])
+            new_ids.append(features["id"])
+            new_rows.append([
+                np.nan if features.get(column) is None else features.get(column)
+                for column in AUDIO_FEATURE_COLUMNS
+            ])
+
+        if not new_ids:
+            print("No new audio features to append to the feature store.")
+            return 0
+
+        self._save({
+            self.track_ids_path: np.concatenate([self.track_ids, np.asarray(new_ids, dtype="<U22")]),
+            self.features_path: np.concatenate([np.asarray(self.features), np.asarray(new_rows, dtype=np.float32)]),
+        })
+        self.load()
+        print(f"Appended {len(new_ids)} tracks to the feature store ({len(self)} total).")
+        return len(new_ids)
+
+    def mark_unavailable(self, track_ids):
+        """Records tracks Spotify returned no audio features for and persists the list. Returns the number newly added."""
+        new_ids = set(track_ids) - self.unavailable_ids - set(self._row_index)
+        if not new_ids:
+            return 0
+        self.unavailable_ids |= new_ids
+        self._save({self.unavailable_ids_path: np.asarray(sorted(self.unavailable_ids), dtype="<U22")})
+        print(f"Marked {len(new_ids)} tracks as having no audio features ({len(self.unavailable_ids)} total).")
+        return len(new_ids)
+
+    def pull_from_gcs(self, bucket_name):
+        """Downloads the GCS mirror of the store to local disk, if one exists."""
+        if not bucket_name:
+            raise ValueError("GCS_BUCKET_NAME environment variable not set.")
+        bucket = get_storage_client().bucket(bucket_name)
+        blobs = {file_name: bucket.blob(f"{FEATURE_STORE_GCS_PREFIX}/{file_name}") for file_name in self._file_paths()}
+        # GCS is the source of truth: drop local leftovers of a warm instance whose push never happened
+        for path in self._file_paths().values():
+            if os.path.exists(path): os.remove(path)
+        if not (blobs[TRACK_IDS_FILE].exists() and blobs[FEATURES_FILE].exists()):
+            print(f"No feature store found at gs://{bucket_name}/{FEATURE_STORE_GCS_PREFIX}, starting empty.")
+            return self.load()
+        os.makedirs(self.base_dir, exist_ok=True)
+        for file_name, path in self._file_paths().items():
+            if file_name == UNAVAILABLE_IDS_FILE and not blobs[file_name].exists(): continue
+            blobs[file_name].download_to_filename(path)
+        print(f"Pulled feature store from gs://{bucket_name}/{FEATURE_STORE_GCS_PREFIX}.")
+        return self.load()
+
+    def push_to_gcs(self, bucket_name):
+        """Uploads the local store files to GCS."""
+        if not bucket_name:
+            raise ValueError("GCS_BUCKET_NAME environment variable not set.")
+        try:
+            bucket = get_storage_client().bucket(bucket_name)
+            for file_name, path in self._file_paths().items():
+                if not os.path.exists(path): continue
+                bucket.blob(f"{FEATURE_STORE_GCS_PREFIX}/{file_name}").upload_from_filename(path)
+            print(f"Pushed feature store to gs://{bucket_name}/{FEATURE_STORE_GCS_PREFIX}.")
+        except Exception as e:
+            print(f"Error uploading feature store to GCS bucket {bucket_name}: {e}")
+            raise RuntimeError("Failed to upload feature store to GCS") from e
+
+
+# --- Spotify Audio Features ---
+def fetch_spotify_audio_features_batch(access_token, track_ids):
+    """
+    Fetches audio features for up to AUDIO_FEATURES_BATCH_SIZE tracks in a single request.
+
+    Returns:
+        tuple: (status, features) where status is "ok", "forbidden" or "error". On "ok",
+               IDs missing from features are tracks Spotify has no audio features for.
+    """
+    audio_features_endpoint = f"{SPOTIFY_API_BASE_URL}/audio-features"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"ids": ",".join(track_ids)}
+
+    try:
+        response = requests.get(audio_features_endpoint, headers=headers, params=params, timeout=10)
+        if response.status_code == 429:
+            # Rate limited: wait as instructed and retry the batch once
+            retry_after = int(response.headers.get("Retry-After", 1))
+            print(f"WARN: Rate limited by Spotify, retrying batch in {retry_after}s.")
+            time.sleep(retry_after)
+            response = requests.get(audio_features_endpoint, headers=headers, params=params, timeout=10)
+        if response.status_code == 403:
+            print(f"WARN: Received 403 Forbidden for GET /audio-features request.")
+            return ("forbidden", [])
+
+        response.raise_for_status()
+
+        # The response is like {"audio_features": [ {...}, null, {...} ]}
+        audio_features = response.json().get("audio_features") or []
+        return ("ok", [features for features in audio_features if features is not None])
+
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching audio features batch: {e}")
+        if 'response' in locals() and response is not None:
+            print(f"Status Code: {response.status_code}")
+            print(f"Response Text: {response.text}")
+        return ("error", []) # Other batches still land; this one is retried next run
+
+def fetch_spotify_audio_features(access_token, track_ids):
+    """
+    Fetches audio features for any number of tracks, issuing 100-ID batches concurrently.
+
+    Returns:
+        tuple: (fetched audio-features objects, IDs Spotify returned null for).
+    """
+    ids_to_fetch = [track_id for track_id in track_ids if track_id]
+    if not ids_to_fetch:
+        print("No track IDs provided to fetch audio features.")
+        return [], []
+
+    batches = [
+        ids_to_fetch[i:i + AUDIO_FEATURES_BATCH_SIZE]
+        for i in range(0, len(ids_to_fetch), AUDIO_FEATURES_BATCH_SIZE)
+    ]
+    print(f"Fetching audio features for {len(ids_to_fetch)} tracks in {len(batches)} batches...")
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        results = list(executor.map(lambda batch: fetch_spotify_audio_features_batch(access_token, batch), batches))
+
+    # No access to the endpoint at all (e.g. apps cut off from /audio-features) must not look like success
+    if all(status == "forbidden" for status, _ in results):
+        raise RuntimeError("Spotify denied access to /audio-features for every batch.")
+
+    fetched_features = []
+    unavailable_ids = []
+    for batch, (status, batch_features) in zip(batches, results):
+        fetched_features.extend(batch_features)
+        if status == "ok":
+            returned_ids = {features.get("id") for features in batch_features}
+            unavailable_ids.extend(track_id for track_id in batch if track_id not in returned_ids)
+
+    print(f"Successfully fetched audio features for {len(fetched_features)} tracks ({len(unavailable_ids)} unavailable).")
+    return fetched_features, unavailable_ids
+
+
+# --- BigQuery Mirror ---
+def ensure_audio_features_table():
+    """Creates the BigQuery audio features table if it does not exist yet."""
+    feature_columns_ddl = ",\n        ".join(f"{column} FLOAT64" for column in AUDIO_FEATURE_COLUMNS)
+    create_sql = f"""
+    CREATE TABLE IF NOT EXISTS `{AUDIO_FEATURES_TABLE_FULL_ID}` (
+        track_id STRING NOT NULL,
+        {feature_columns_ddl},
+        first_seen_snapshot_date DATE
+    )
+    """
+    get_bq_client().query(create_sql).result()
+
+def merge_audio_features_to_bq(track_ids, feature_rows, latest_snapshot_date):
+    """Merges feature store rows into the BigQuery audio features table using parallel arrays."""
+    if len(track_ids) == 0:
+        print("No audio features provided to merge into BigQuery.")
+        return 0
+
+    print(f"Attempting to MERGE {len(track_ids)} audio feature records into {AUDIO_FEATURES_TABLE_FULL_ID} using parallel arrays...")
+
+    # --- Construct MERGE statement using UNNEST ---
+    # One array parameter per feature column, zipped back together by offset.
+    # BigQuery arrays cannot hold NULLs, so missing features travel as NaN and are converted back here.
+    unnest_sql = "\n        ".join(
+        f"JOIN UNNEST(@{column}_param) AS {column} WITH OFFSET idx_{column} ON idx_id = idx_{column}"
+        for column in AUDIO_FEATURE_COLUMNS
+    )
+    select_sql = ",\n        ".join(f"IF(IS_NAN({column}), NULL, {column}) AS {column}" for column in AUDIO_FEATURE_COLUMNS)
+    update_sql = ",\n            ".join(f"target.{column} = source.{column}" for column in AUDIO_FEATURE_COLUMNS)
+    insert_columns = ", ".join(AUDIO_FEATURE_COLUMNS)
+    insert_values = ", ".join(f"source.{column}" for column in AUDIO_FEATURE_COLUMNS)
+
+    merge_sql = f"""
+    MERGE `{AUDIO_FEATURES_TABLE_FULL_ID}` AS target
+    USING (
+      SELECT
+        id AS track_id,
+        {select_sql}
+      FROM
+        UNNEST(@track_ids_param) AS id WITH OFFSET idx_id
+        {unnest_sql}
+    ) AS source
+    ON target.track_id = source.track_id
+    WHEN MATCHED THEN
+        UPDATE SET
+            {update_sql}
+    WHEN NOT MATCHED THEN
+        INSERT (track_id, {insert_columns}, first_seen_snapshot_date)
+        VALUES (source.track_id, {insert_values}, @snapshot_date_param)
+    """
+
+    feature_rows = np.asarray(feature_rows, dtype=np.float64)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("track_ids_param", "STRING", list(track_ids)),
+            *[
+                bigquery.ArrayQueryParameter(f"{column}_param", "FLOAT64", feature_rows[:, i].tolist())
+                for i, column in enumerate(AUDIO_FEATURE_COLUMNS)
+            ],
+            bigquery.ScalarQueryParameter("snapshot_date_param", "DATE", latest_snapshot_date),
+        ]
+    )
+
+    # --- Execute Query ---
+    try:
+        print("Executing BigQuery MERGE statement...")
+        query_job = get_bq_client().query(merge_sql, job_config=job_config)
+        query_job.result() # Wait for the job to complete
+        print(f"BigQuery MERGE job completed. Affected rows: {query_job.num_dml_affected_rows}")
+        return query_job.num_dml_affected_rows
+    except Exception as e:
+        print(f"Error executing BigQuery MERGE statement: {e}")
+        print(f"SQL Query: {merge_sql[:1500]}...")
+        raise RuntimeError("Failed to merge audio features into BigQuery") from e
+
+
+# --- Aggregates ---
+def finite_or_none(value):
+    """Converts a NumPy scalar to float, mapping NaN/inf (e.g. the mean of all-missing values) to None."""
+    return float(value) if np.isfinite(value) else None
+
+def cosine_drift(previous_vector, current_vector):
+    """Cosine distance (1 - cosine similarity) between two feature vectors, or None if undefined."""
+    norms = np.linalg.norm(previous_vector) * np.linalg.norm(current_vector)
+    if norms == 0:
+        return None
+    return float(1.0 - np.dot(previous_vector, current_vector) / norms)
+
+def compute_snapshot_aggregates(store, snapshot_track_ids):
+    """
+    Computes per-snapshot audio feature aggregates from the feature store.
+
+    Args:
+        store (AudioFeatureStore): A loaded feature store.
+        snapshot_track_ids (dict): Maps snapshot date -> list of track IDs in that snapshot.
+
+    Returns:
+        list: One dict per snapshot (oldest first) with mean energy/valence/tempo and the
+              cosine drift of the snapshot's feature centroid from the previous snapshot.
+    """
+    if len(store) == 0:
+        print("Feature store is empty, no aggregates to compute.")
+        return []
+
+    drift_columns = [AUDIO_FEATURE_COLUMNS.index(column) for column in DRIFT_FEATURE_COLUMNS]
+    # Standardise drift features over the whole store so tempo/loudness don't dominate the cosine
+    drift_features = np.asarray(store.features[:, drift_columns], dtype=np.float64)
+    # A feature missing for every track gives a NaN (reported as None), not a failure
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        drift_mean = np.nanmean(drift_features, axis=0)
+        drift_std = np.nanstd(drift_features, axis=0)
+    drift_std[drift_std == 0] = 1.0
+
+    energy_idx = AUDIO_FEATURE_COLUMNS.index("energy")
+    valence_idx = AUDIO_FEATURE_COLUMNS.index("valence")
+    tempo_idx = AUDIO_FEATURE_COLUMNS.index("tempo")
+
+    aggregates = []
+    previous_centroid = None
+    for snapshot_date in sorted(snapshot_track_ids):
+        rows = store.rows_for(snapshot_track_ids[snapshot_date])
+        if rows.size == 0:
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            snapshot_means = np.nanmean(np.asarray(store.features[rows], dtype=np.float64), axis=0)
+        centroid = np.nan_to_num((snapshot_means[drift_columns] - drift_mean) / drift_std)
+
+        aggregates.append({
+            "snapshot_date": snapshot_date.isoformat(),
+            "track_count": int(rows.size),
+            "mean_energy": finite_or_none(snapshot_means[energy_idx]),
+            "mean_valence": finite_or_none(snapshot_means[valence_idx]),
+            "mean_tempo": finite_or_none(snapshot_means[tempo_idx]),
+            "cosine_drift": None if previous_centroid is None else cosine_drift(previous_centroid, centroid),
+        })
+        previous_centroid = centroid
+
+    return aggregates
+
+
+# --- Main Function ---
+@functions_framework.http
+def enrich_audio_features_http(request):
+    """HTTP Cloud Function to enrich the audio feature store and return per-snapshot aggregates."""
+    print("Audio features enrichment function triggered.")
+    try:
+        # 1. Get track IDs per snapshot from staging tracks
+        print(f"Fetching track IDs per snapshot from {STG_TRACKS_TABLE_FULL_ID}...")
+        query_snapshot_tracks = f"""
+            SELECT track_snapshot_date, ARRAY_AGG(DISTINCT track_id) AS track_ids
+            FROM `{STG_TRACKS_TABLE_FULL_ID}`
+            WHERE track_id IS NOT NULL
+            GROUP BY track_snapshot_date
+        """
+        query_job_tracks = get_bq_client().query(query_snapshot_tracks)
+        snapshot_track_ids = {row.track_snapshot_date: list(row.track_ids) for row in query_job_tracks.result()}
+
+        if not snapshot_track_ids:
+            print("No tracks found in staging table. Exiting.")
+            return ("No data in staging", 200)
+
+        latest_snapshot_date = max(snapshot_track_ids)
+        print(f"Found {len(snapshot_track_ids)} snapshots, latest snapshot date: {latest_snapshot_date}")
+
+        # 2. Load the feature store and determine tracks not yet enriched
+        store = AudioFeatureStore(FEATURE_STORE_DIR).pull_from_gcs(GCS_BUCKET_NAME)
+        tracks_to_fetch = store.missing(
+            track_id for track_ids in snapshot_track_ids.values() for track_id in track_ids
+        )
+        print(f"Identified {len(tracks_to_fetch)} new tracks to fetch audio features for.")
+
+        # 3. Fetch audio features from Spotify if needed
+        if tracks_to_fetch:
+            print("Fetching Spotify credentials for enrichment...")
+            client_id = get_secret(SPOTIFY_CLIENT_ID_SECRET_NAME)
+            client_secret = get_secret(SPOTIFY_CLIENT_SECRET_SECRET_NAME)
+            refresh_token = get_secret(SPOTIFY_REFRESH_TOKEN_SECRET_NAME)
+
+            access_token = refresh_spotify_access_token(client_id, client_secret, refresh_token)
+            if not access_token:
+                 raise ValueError("Could not obtain Spotify access token for enrichment.")
+
+            fetched_audio_features, unavailable_ids = fetch_spotify_audio_features(access_token, tracks_to_fetch)
+
+            # 4. Append to the feature store and mirror it to GCS and BigQuery
+            first_new_row = len(store)
+            rows_added = store.append(fetched_audio_features)
+            unavailable_added = store.mark_unavailable(unavailable_ids)
+            if rows_added:
+                # Merge into BigQuery before publishing the store: if the MERGE fails, the GCS
+                # mirror still lacks these rows and the next run fetches and merges them again
+                ensure_audio_features_table()
+                merge_audio_features_to_bq(
+                    store.track_ids[first_new_row:].tolist(),
+                    store.features[first_new_row:],
+                    latest_snapshot_date,
+                )
+            if rows_added or unavailable_added:
+                store.push_to_gcs(GCS_BUCKET_NAME)
+            else:
+                print("No audio features fetched from Spotify API, skipping store update.")
+        else:
+            print("No new tracks require audio features.")
+
+        # 5. Compute per-snapshot aggregates in memory
+        aggregates = compute_snapshot_aggregates(store, snapshot_track_ids)
+        print(f"Computed audio feature aggregates for {len(aggregates)} snapshots.")
+
+        print("Audio features enrichment process completed successfully.")
+        return (json.dumps({"snapshots": aggregates}, allow_nan=False), 200, {"Content-Type": "application/json"})
+
+    except Exception as e:
+        print(f"Error during audio features enrichment: {e}")
+        return (f"Error: {e}", 500)
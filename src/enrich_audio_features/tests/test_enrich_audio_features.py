@@ -0,0 +1,99 @@
+"""Offline checks of the audio feature store, batched fetching and snapshot aggregates (no GCP or Spotify access)."""
+import datetime
+import importlib.util
+import json
+import math
+import os
+
+import pytest
+
+# Every function directory has a main.py, so load this one by path
+_spec = importlib.util.spec_from_file_location(
+    "enrich_audio_features_main", os.path.join(os.path.dirname(__file__), os.pardir, "main.py")
+)
+enrich_audio_features = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(enrich_audio_features)
+
+APR_1 = datetime.date(2025, 4, 1)
+APR_2 = datetime.date(2025, 4, 2)
+
+
+def audio_features(track_id, **values):
+    features = {column: 0.5 for column in enrich_audio_features.AUDIO_FEATURE_COLUMNS}
+    features.update(values, id=track_id)
+    return features
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = json.dumps(payload)
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise enrich_audio_features.requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return enrich_audio_features.AudioFeatureStore(str(tmp_path / "store")).load()
+
+
+def test_append_skips_duplicates_and_stored_tracks(store):
+    assert store.append([audio_features("t1"), audio_features("t1"), None, {"id": None}, audio_features("t2")]) == 2
+    assert store.append([audio_features("t2"), audio_features("t3")]) == 1
+    assert store.track_ids.tolist() == ["t1", "t2", "t3"]
+    assert store.features.shape == (3, len(enrich_audio_features.AUDIO_FEATURE_COLUMNS))
+
+
+def test_missing_excludes_stored_and_unavailable_tracks_after_reload(store):
+    store.append([audio_features("t1")])
+    assert store.mark_unavailable(["t2", "t1"]) == 1
+
+    reloaded = enrich_audio_features.AudioFeatureStore(store.base_dir).load()
+    assert reloaded.unavailable_ids == {"t2"}
+    assert reloaded.missing(["t3", "t1", None, "t2", "t3"]) == ["t3"]
+
+
+def test_fetch_marks_null_features_unavailable_but_not_failed_batches(monkeypatch):
+    monkeypatch.setattr(enrich_audio_features, "AUDIO_FEATURES_BATCH_SIZE", 2)
+    responses = {
+        "t1,t2": FakeResponse(200, {"audio_features": [audio_features("t1"), None]}),
+        "t3,t4": FakeResponse(500),
+    }
+    monkeypatch.setattr(
+        enrich_audio_features.requests, "get", lambda url, params, **kwargs: responses[params["ids"]]
+    )
+
+    fetched, unavailable = enrich_audio_features.fetch_spotify_audio_features("token", ["t1", "t2", "t3", "t4"])
+    assert [features["id"] for features in fetched] == ["t1"]
+    assert unavailable == ["t2"]
+
+
+def test_fetch_raises_when_every_batch_is_forbidden(monkeypatch):
+    monkeypatch.setattr(enrich_audio_features.requests, "get", lambda *args, **kwargs: FakeResponse(403))
+    with pytest.raises(RuntimeError, match="every batch"):
+        enrich_audio_features.fetch_spotify_audio_features("token", ["t1", "t2"])
+
+
+def test_aggregates_report_all_missing_features_as_none(store):
+    store.append([
+        audio_features("t1", energy=0.2, valence=None, tempo=100.0),
+        audio_features("t2", energy=0.4, valence=None, tempo=None),
+        audio_features("t3", energy=0.9, valence=None, tempo=140.0),
+    ])
+
+    aggregates = enrich_audio_features.compute_snapshot_aggregates(store, {APR_2: ["t3"], APR_1: ["t1", "t2", "t4"]})
+    assert [(row["snapshot_date"], row["track_count"]) for row in aggregates] == [("2025-04-01", 2), ("2025-04-02", 1)]
+    assert aggregates[0]["mean_energy"] == pytest.approx(0.3)
+    assert aggregates[0]["mean_tempo"] == pytest.approx(100.0)
+    assert aggregates[0]["mean_valence"] is None
+    assert aggregates[0]["cosine_drift"] is None
+    assert math.isfinite(aggregates[1]["cosine_drift"])
+    # The HTTP response is serialised with allow_nan=False
+    json.dumps({"snapshots": aggregates}, allow_nan=False)
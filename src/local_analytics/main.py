@@ -0,0 +1,579 @@
+import argparse
+import glob
+import json
+import math
+import os
+
+import duckdb
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv() # Load .env file for local execution
+
+GCP_PROJECT_ID = os.environ.get("GCP_PROJECT_ID")
+GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME")
+BQ_DATASET_ID = os.environ.get("BQ_DATASET_ID", "music_pulse_warehouse")
+
+# Local mirror of gs://<bucket>/spotify/raw and the DuckDB file caching what has been loaded from it
+RAW_DIR = os.environ.get("LOCAL_RAW_DIR", "data/spotify/raw")
+CACHE_PATH = os.environ.get("LOCAL_CACHE_PATH", "data/music_pulse.duckdb")
+GCS_RAW_PREFIX = "spotify/raw"
+
+# Same partition layout the ingestion function writes and the BQ external tables read.
+# enriched_artists holds the /artists responses enrich_artists MERGEs into dim_artists.
+RAW_KINDS = ["tracks", "artists", "enriched_artists"]
+PARTITION_GLOB = "year=*/month=*/day=*/*.json"
+
+# Only the fields the marts need; everything else in the raw JSON is ignored while parsing
+RAW_COLUMNS = {
+    "tracks": {
+        "id": "VARCHAR",
+        "name": "VARCHAR",
+        "popularity": "BIGINT",
+        "artists": "STRUCT(id VARCHAR)[]",
+        "album": "STRUCT(id VARCHAR, release_date VARCHAR, release_date_precision VARCHAR)",
+    },
+    "artists": {
+        "id": "VARCHAR",
+        "name": "VARCHAR",
+        "popularity": "BIGINT",
+        "genres": "VARCHAR[]",
+    },
+}
+RAW_COLUMNS["enriched_artists"] = RAW_COLUMNS["artists"]
+
+# Mart name -> key columns identifying a row (used when comparing against BigQuery)
+MART_KEYS = {
+    "mart_avg_popularity_trends": ["track_snapshot_date"],
+    "mart_latest_track_vintages": ["track_snapshot_date", "release_decade"],
+    "mart_latest_genre_distribution": ["track_snapshot_date", "genre"],
+}
+
+# --- DuckDB ports of the dbt models ---
+# Same logic as models/, trimmed to the columns the marts read.
+MODEL_SQL = {
+    "stg_top_tracks": """
+        SELECT
+            id AS track_id,
+            name AS track_name,
+            artists[1].id AS primary_artist_id,
+            album.id AS album_id,
+            CAST(popularity AS INTEGER) AS track_popularity,
+            album.release_date AS album_release_date,
+            album.release_date_precision AS album_release_date_precision,
+            snapshot_date AS track_snapshot_date,
+            source_file
+        FROM raw_tracks
+    """,
+    "stg_top_artists": """
+        SELECT
+            id AS artist_id,
+            name AS artist_name,
+            CAST(popularity AS INTEGER) AS artist_popularity,
+            genres AS artist_genres,
+            snapshot_date AS artist_snapshot_date,
+            source_file
+        FROM raw_artists
+    """,
+    "dim_albums": """
+        WITH latest_album_snapshot AS (
+            SELECT
+                album_id,
+                CASE album_release_date_precision
+                    WHEN 'day' THEN CAST(try_strptime(album_release_date, '%Y-%m-%d') AS DATE)
+                    WHEN 'month' THEN CAST(try_strptime(album_release_date, '%Y-%m') AS DATE)
+                    WHEN 'year' THEN CAST(try_strptime(album_release_date, '%Y') AS DATE)
+                    ELSE NULL
+                END AS album_release_date_parsed,
+                ROW_NUMBER() OVER(PARTITION BY album_id ORDER BY track_snapshot_date DESC, source_file DESC) AS rn
+            FROM stg_top_tracks
+            WHERE album_id IS NOT NULL
+        )
+        SELECT album_id, album_release_date_parsed
+        FROM latest_album_snapshot
+        WHERE rn = 1
+    """,
+    "dim_artists": """
+        WITH latest_artist_snapshot AS (
+            SELECT
+                *,
+                ROW_NUMBER() OVER(PARTITION BY artist_id ORDER BY artist_snapshot_date DESC, source_file DESC) AS rn
+            FROM stg_top_artists
+            WHERE artist_id IS NOT NULL
+        ),
+        top_artists AS (
+            SELECT artist_id, artist_popularity, artist_genres
+            FROM latest_artist_snapshot
+            WHERE rn = 1
+        ),
+        -- Not part of the dbt model: enrich_artists MERGEs track artists missing from dim_artists
+        -- into the table, and the incremental dbt run only overwrites those seen in stg_top_artists
+        latest_enriched_artist AS (
+            SELECT
+                id AS artist_id,
+                CAST(popularity AS INTEGER) AS artist_popularity,
+                genres AS artist_genres,
+                ROW_NUMBER() OVER(PARTITION BY id ORDER BY snapshot_date DESC, source_file DESC) AS rn
+            FROM raw_enriched_artists
+            WHERE id IS NOT NULL
+        )
+        SELECT * FROM top_artists
+        UNION ALL
+        SELECT artist_id, artist_popularity, artist_genres
+        FROM latest_enriched_artist
+        WHERE rn = 1 AND artist_id NOT IN (SELECT artist_id FROM top_artists)
+    """,
+    "fct_snapshot_top_items": """
+        SELECT
+            stg_tracks.track_snapshot_date,
+            stg_tracks.track_id,
+            stg_tracks.track_name,
+            stg_tracks.track_popularity,
+            dim_albums.album_release_date_parsed,
+            dim_artists.artist_popularity,
+            dim_artists.artist_genres
+        FROM stg_top_tracks AS stg_tracks
+        LEFT JOIN dim_albums
+            ON stg_tracks.album_id = dim_albums.album_id
+        LEFT JOIN dim_artists
+            ON stg_tracks.primary_artist_id = dim_artists.artist_id
+    """,
+}
+
+# Dialect differences from the dbt SQL: SAFE_DIVIDE -> NULLIF division, UNNEST needs a column alias.
+# Everything else is copied as-is so edits to models/marts can be pasted across.
+MART_SQL = {
+    "mart_avg_popularity_trends": """
+        WITH fct_data AS (
+            -- Select the necessary columns from our fact table
+            SELECT
+                track_snapshot_date,
+                track_popularity, -- Popularity of the track itself
+                artist_popularity -- Popularity of the primary artist (from dim_artists)
+            FROM fct_snapshot_top_items
+        )
+        SELECT
+            track_snapshot_date,
+            -- Calculate average popularity, ignoring NULLs
+            AVG(track_popularity) AS avg_track_popularity,
+            AVG(artist_popularity) AS avg_artist_popularity
+        FROM fct_data
+        GROUP BY
+            track_snapshot_date
+        ORDER BY
+            track_snapshot_date DESC
+    """,
+    "mart_latest_track_vintages": """
+        WITH fct_data AS (
+            -- Select the necessary columns from our fact table
+            SELECT
+                track_snapshot_date,
+                track_id,
+                album_release_date_parsed -- The DATE column we created earlier
+            FROM fct_snapshot_top_items
+            WHERE
+                album_release_date_parsed IS NOT NULL -- Only consider tracks with a valid release date
+        ),
+
+        track_decades AS (
+            -- Assign a decade category based on the album release year
+            SELECT
+                track_snapshot_date,
+                track_id,
+                album_release_date_parsed,
+                EXTRACT(YEAR FROM album_release_date_parsed) AS release_year,
+                CASE
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 2020 THEN '2020s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 2010 THEN '2010s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 2000 THEN '2000s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1990 THEN '1990s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1980 THEN '1980s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1970 THEN '1970s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1960 THEN '1960s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1950 THEN '1950s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1940 THEN '1940s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1930 THEN '1930s'
+                    WHEN EXTRACT(YEAR FROM album_release_date_parsed) >= 1920 THEN '1920s'
+                    ELSE 'Older or Unknown'
+                END AS release_decade
+            FROM fct_data
+        ),
+
+        counts_per_decade AS (
+            -- Count distinct tracks per decade per snapshot date
+            SELECT
+                track_snapshot_date,
+                release_decade,
+                COUNT(DISTINCT track_id) AS track_count
+            FROM track_decades
+            GROUP BY
+                track_snapshot_date,
+                release_decade
+        ),
+
+        total_tracks_per_snapshot AS (
+            -- Count total distinct tracks per snapshot date (for percentage calculation)
+            SELECT
+                track_snapshot_date,
+                COUNT(DISTINCT track_id) AS total_tracks
+            FROM track_decades -- Use track_decades to count only tracks included in vintage calc
+            GROUP BY
+                track_snapshot_date
+        )
+        -- Final Mart Table: Snapshot Date, Decade, Track Count for Decade, Total Tracks for Snapshot, Percentage
+        SELECT
+            d.track_snapshot_date,
+            d.release_decade,
+            d.track_count,
+            t.total_tracks,
+            d.track_count / NULLIF(t.total_tracks, 0) * 100 AS percentage_of_tracks
+        FROM counts_per_decade d
+        JOIN total_tracks_per_snapshot t
+            ON d.track_snapshot_date = t.track_snapshot_date
+        ORDER BY
+            d.track_snapshot_date DESC,
+            -- Order decades chronologically for charting
+            CASE d.release_decade
+                WHEN '2020s' THEN 1
+                WHEN '2010s' THEN 2
+                WHEN '2000s' THEN 3
+                WHEN '1990s' THEN 4
+                WHEN '1980s' THEN 5
+                WHEN '1970s' THEN 6
+                WHEN '1960s' THEN 7
+                WHEN '1950s' THEN 8
+                WHEN '1940s' THEN 9
+                WHEN '1930s' THEN 10
+                WHEN '1920s' THEN 11
+                ELSE 13
+            END
+    """,
+    "mart_latest_genre_distribution": """
+        WITH fact_table AS (
+            -- Select relevant columns from the core fact table
+            SELECT
+                track_snapshot_date,
+                track_id,
+                track_name, -- Keep for potential inspection/display
+                artist_genres -- This is the ARRAY<STRING>
+            FROM fct_snapshot_top_items
+            -- Ensure we only consider snapshots where artist data was successfully joined and genres exist
+            WHERE track_id IS NOT NULL AND ARRAY_LENGTH(artist_genres) > 0
+        ),
+
+        unnested_genres AS (
+            -- Explode the genres array so each row represents one artist and one genre for a snapshot date
+            -- Also, keep track of distinct artists per snapshot date here
+            SELECT DISTINCT -- Ensure one row per artist per snapshot before unnesting
+                track_snapshot_date,
+                track_id,
+                track_name,
+                genre -- The individual genre string after unnesting
+            FROM fact_table
+            CROSS JOIN UNNEST(artist_genres) AS unnested(genre)
+        ),
+
+        genre_counts_per_snapshot AS (
+            -- Count distinct artists per genre per snapshot date
+            SELECT
+                track_snapshot_date,
+                genre,
+                COUNT(DISTINCT track_id) AS track_count
+            FROM unnested_genres
+            GROUP BY
+                track_snapshot_date,
+                genre
+        ),
+
+        total_tracks_per_snapshot AS (
+             -- Calculate the total number of unique artists *with genres* for each snapshot date
+            SELECT
+                track_snapshot_date,
+                COUNT(DISTINCT track_id) AS total_tracks
+            FROM unnested_genres -- Count distinct artists AFTER unnesting/filtering
+            GROUP BY
+                track_snapshot_date
+        )
+        -- Final Mart Table:
+        SELECT
+            g.track_snapshot_date,
+            g.genre,
+            g.track_count,
+            t.total_tracks,
+            -- Calculate percentage, avoiding division by zero
+            g.track_count / NULLIF(t.total_tracks, 0) * 100 AS percentage_of_tracks
+        FROM genre_counts_per_snapshot g
+        JOIN total_tracks_per_snapshot t
+            ON g.track_snapshot_date = t.track_snapshot_date
+        ORDER BY
+            g.track_snapshot_date DESC,
+            g.track_count DESC
+    """,
+}
+
+
+class LocalMartEngine:
+    """
+    In-process DuckDB engine computing the dbt marts from raw NDJSON partitions.
+
+    Parsed partitions are cached in a DuckDB file together with the size/mtime of
+    the file they came from, so refresh() only parses new or changed files. Marts
+    are rebuilt as tables whenever anything was (re)loaded.
+    """
+
+    def __init__(self, raw_dir=RAW_DIR, cache_path=CACHE_PATH):
+        self.raw_dir = raw_dir
+        if cache_path != ":memory:":
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.con = duckdb.connect(cache_path)
+        self._create_cache_tables()
+
+    def _create_cache_tables(self):
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS processed_files (
+                source_file VARCHAR PRIMARY KEY,
+                kind VARCHAR,
+                size BIGINT,
+                mtime DOUBLE
+            )
+        """)
+        for kind, columns in RAW_COLUMNS.items():
+            column_ddl = ", ".join(f"{name} {column_type}" for name, column_type in columns.items())
+            self.con.execute(
+                f"CREATE TABLE IF NOT EXISTS raw_{kind} ({column_ddl}, snapshot_date DATE, source_file VARCHAR)"
+            )
+
+    def _pending_files(self, kind):
+        """
+        Compares cached partition files of the given kind with what is on disk.
+
+        Returns:
+            tuple: (new or changed files as (path, size, mtime), cached paths no longer on disk).
+        """
+        processed = {
+            source_file: (size, mtime)
+            for source_file, size, mtime in self.con.execute(
+                "SELECT source_file, size, mtime FROM processed_files WHERE kind = ?", [kind]
+            ).fetchall()
+        }
+        pending = []
+        on_disk = set()
+        for path in sorted(glob.glob(os.path.join(self.raw_dir, kind, PARTITION_GLOB))):
+            stat = os.stat(path)
+            on_disk.add(path)
+            if processed.get(path) != (stat.st_size, stat.st_mtime):
+                pending.append((path, stat.st_size, stat.st_mtime))
+        removed = sorted(processed.keys() - on_disk)
+        return pending, removed
+
+    def _remove_files(self, kind, paths):
+        """Drops cached rows of files that were deleted or moved out of raw_dir."""
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute(f"DELETE FROM raw_{kind} WHERE source_file IN (SELECT unnest(?))", [paths])
+            self.con.execute("DELETE FROM processed_files WHERE source_file IN (SELECT unnest(?))", [paths])
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+
+    def _load_files(self, kind, pending):
+        """Parses pending files into raw_<kind>, replacing rows from earlier versions of the same files."""
+        paths = [path for path, _, _ in pending]
+        columns = ", ".join(f"'{name}': '{column_type}'" for name, column_type in RAW_COLUMNS[kind].items())
+        column_names = ", ".join(RAW_COLUMNS[kind])
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute(f"DELETE FROM raw_{kind} WHERE source_file IN (SELECT unnest(?))", [paths])
+            self.con.execute(
+                f"""
+                INSERT INTO raw_{kind}
+                SELECT
+                    {column_names},
+                    -- Snapshot date comes from the hive partition keys, as in the staging models
+                    make_date(
+                        CAST(regexp_extract(filename, 'year=(\\d+)', 1) AS INTEGER),
+                        CAST(regexp_extract(filename, 'month=(\\d+)', 1) AS INTEGER),
+                        CAST(regexp_extract(filename, 'day=(\\d+)', 1) AS INTEGER)
+                    ) AS snapshot_date,
+                    filename AS source_file
+                FROM read_json(?, format = 'newline_delimited', filename = true, columns = {{{columns}}})
+                """,
+                [paths],
+            )
+            self.con.executemany(
+                "INSERT OR REPLACE INTO processed_files VALUES (?, ?, ?, ?)",
+                [[path, kind, size, mtime] for path, size, mtime in pending],
+            )
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+
+    def _build_marts(self):
+        for name, sql in MODEL_SQL.items():
+            self.con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql}")
+        for name, sql in MART_SQL.items():
+            self.con.execute(f"CREATE OR REPLACE TABLE {name} AS {sql}")
+
+    def refresh(self):
+        """Syncs the cache with raw_dir and rebuilds the marts if needed. Returns the number of files loaded or removed."""
+        changed = 0
+        for kind in RAW_KINDS:
+            pending, removed = self._pending_files(kind)
+            if removed:
+                self._remove_files(kind, removed)
+                changed += len(removed)
+                print(f"Removed {len(removed)} deleted {kind} partition files from the cache.")
+            if pending:
+                self._load_files(kind, pending)
+                changed += len(pending)
+                print(f"Loaded {len(pending)} new or changed {kind} partition files.")
+
+        marts_missing = any(
+            not self.con.execute(
+                "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [name]
+            ).fetchone()[0]
+            for name in MART_SQL
+        )
+        if changed or marts_missing:
+            self._build_marts()
+            print(f"Rebuilt {len(MART_SQL)} marts.")
+        else:
+            print("No new, changed or deleted partitions found, using cached marts.")
+        return changed
+
+    def mart(self, name):
+        """Returns a mart as a DuckDB relation (call .df(), .arrow() or .fetchall() on it)."""
+        if name not in MART_SQL:
+            raise ValueError(f"Unknown mart '{name}'. Expected one of {list(MART_SQL)}")
+        return self.con.table(name)
+
+    def close(self):
+        self.con.close()
+
+
+def sync_raw_from_gcs(bucket_name, raw_dir=RAW_DIR):
+    """Downloads raw partition files from GCS that are missing (or differ in size) locally. Returns the number downloaded."""
+    if not bucket_name:
+        raise ValueError("GCS_BUCKET_NAME environment variable not set.")
+    from google.cloud import storage # Only needed when syncing from GCS
+
+    storage_client = storage.Client(project=GCP_PROJECT_ID)
+    downloaded = 0
+    for kind in RAW_KINDS:
+        for blob in storage_client.list_blobs(bucket_name, prefix=f"{GCS_RAW_PREFIX}/{kind}/"):
+            if not blob.name.endswith(".json"): continue
+            local_path = os.path.join(raw_dir, os.path.relpath(blob.name, GCS_RAW_PREFIX))
+            if os.path.exists(local_path) and os.path.getsize(local_path) == blob.size: continue
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            blob.download_to_filename(local_path)
+            downloaded += 1
+    print(f"Downloaded {downloaded} raw files from gs://{bucket_name}/{GCS_RAW_PREFIX}.")
+    return downloaded
+
+def backfill_enriched_artists_from_bigquery(raw_dir=RAW_DIR, project_id=GCP_PROJECT_ID, dataset_id=BQ_DATASET_ID):
+    """
+    Writes dim_artists rows that only enrich_artists put there (i.e. merged before it started
+    landing its responses in GCS) as enriched_artists NDJSON. Returns the number of artists written.
+    """
+    from google.cloud import bigquery # Only needed for the one-off backfill
+
+    bq_client = bigquery.Client(project=project_id)
+    query = f"""
+        SELECT artist_id, artist_name, artist_popularity, artist_genres, last_seen_artist_snapshot_date
+        FROM `{project_id}.{dataset_id}.dim_artists`
+        WHERE artist_id NOT IN (SELECT artist_id FROM `{project_id}.{dataset_id}.stg_top_artists` WHERE artist_id IS NOT NULL)
+    """
+    rows_by_date = {}
+    for row in bq_client.query(query).result():
+        rows_by_date.setdefault(row.last_seen_artist_snapshot_date, []).append({
+            "id": row.artist_id,
+            "name": row.artist_name,
+            "popularity": row.artist_popularity,
+            "genres": list(row.artist_genres or []),
+        })
+
+    for snapshot_date, artists in rows_by_date.items():
+        partition_dir = os.path.join(
+            raw_dir, "enriched_artists", f"year={snapshot_date:%Y}", f"month={snapshot_date:%m}", f"day={snapshot_date:%d}"
+        )
+        os.makedirs(partition_dir, exist_ok=True)
+        with open(os.path.join(partition_dir, "enriched_artists_backfill.json"), "w") as f:
+            f.writelines(json.dumps(artist, separators=(',', ':')) + "\n" for artist in artists)
+    written = sum(len(artists) for artists in rows_by_date.values())
+    print(f"Backfilled {written} enriched artists from {project_id}.{dataset_id}.dim_artists.")
+    return written
+
+def _values_match(local_value, warehouse_value, tolerance=1e-6):
+    if isinstance(local_value, float) or isinstance(warehouse_value, float):
+        if local_value is None or warehouse_value is None:
+            return local_value is None and warehouse_value is None
+        return math.isclose(local_value, warehouse_value, rel_tol=tolerance, abs_tol=tolerance)
+    return local_value == warehouse_value
+
+def compare_with_bigquery(engine, project_id=GCP_PROJECT_ID, dataset_id=BQ_DATASET_ID):
+    """
+    Checks the local marts against the dbt-built marts in BigQuery.
+
+    Returns:
+        dict: Mart name -> list of mismatch descriptions (empty list means equivalent).
+    """
+    from google.cloud import bigquery # Only needed for the equivalence check
+
+    bq_client = bigquery.Client(project=project_id)
+    mismatches = {}
+    for name, key_columns in MART_KEYS.items():
+        local_relation = engine.mart(name)
+        columns = local_relation.columns
+        local_rows = {
+            tuple(row[columns.index(key)] for key in key_columns): row
+            for row in local_relation.fetchall()
+        }
+        warehouse_rows = {
+            tuple(row[key] for key in key_columns): tuple(row[column] for column in columns)
+            for row in bq_client.query(f"SELECT {', '.join(columns)} FROM `{project_id}.{dataset_id}.{name}`").result()
+        }
+
+        problems = []
+        for key in sorted(local_rows.keys() | warehouse_rows.keys(), key=str):
+            if key not in warehouse_rows:
+                problems.append(f"{key}: only in local engine")
+            elif key not in local_rows:
+                problems.append(f"{key}: only in BigQuery")
+            else:
+                for column, local_value, warehouse_value in zip(columns, local_rows[key], warehouse_rows[key]):
+                    if not _values_match(local_value, warehouse_value):
+                        problems.append(f"{key}: {column} local={local_value} bigquery={warehouse_value}")
+        mismatches[name] = problems
+        print(f"{name}: {'OK' if not problems else f'{len(problems)} mismatches'}")
+    return mismatches
+
+
+# --- Command line entry point ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the Music Pulse marts locally from raw Spotify NDJSON.")
+    parser.add_argument("--raw-dir", default=RAW_DIR, help="Local directory mirroring gs://<bucket>/spotify/raw")
+    parser.add_argument("--cache", default=CACHE_PATH, help="DuckDB file caching parsed partitions (':memory:' to disable)")
+    parser.add_argument("--sync-gcs", action="store_true", help="Download new raw files from GCS_BUCKET_NAME first")
+    parser.add_argument("--backfill-enriched-artists", action="store_true", help="Write artists enriched before GCS landing from BigQuery dim_artists (one-off)")
+    parser.add_argument("--compare-bigquery", action="store_true", help="Check the local marts against the BigQuery marts")
+    parser.add_argument("--mart", choices=list(MART_SQL), help="Only print this mart")
+    args = parser.parse_args()
+
+    if args.sync_gcs:
+        sync_raw_from_gcs(GCS_BUCKET_NAME, args.raw_dir)
+    if args.backfill_enriched_artists:
+        backfill_enriched_artists_from_bigquery(args.raw_dir)
+
+    engine = LocalMartEngine(args.raw_dir, args.cache)
+    engine.refresh()
+    for mart_name in [args.mart] if args.mart else MART_SQL:
+        print(f"\n=== {mart_name}")
+        engine.mart(mart_name).show()
+
+    if args.compare_bigquery:
+        results = compare_with_bigquery(engine)
+        engine.close()
+        raise SystemExit(1 if any(results.values()) else 0)
+    engine.close()
@@ -0,0 +1,75 @@
+"""Offline checks of the local mart engine against hand-computed dbt results for tests/fixtures/raw."""
+import datetime
+import importlib.util
+import os
+import shutil
+
+import pytest
+
+FIXTURES_RAW_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "raw")
+
+# Every function directory has a main.py, so load this one by path
+_spec = importlib.util.spec_from_file_location(
+    "local_analytics_main", os.path.join(os.path.dirname(__file__), os.pardir, "main.py")
+)
+local_analytics = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(local_analytics)
+
+APR_1 = datetime.date(2025, 4, 1)
+APR_2 = datetime.date(2025, 4, 2)
+
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    """Copy of the fixtures, so tests may delete files."""
+    return shutil.copytree(FIXTURES_RAW_DIR, tmp_path / "raw")
+
+
+@pytest.fixture
+def engine(raw_dir, tmp_path):
+    engine = local_analytics.LocalMartEngine(str(raw_dir), str(tmp_path / "cache.duckdb"))
+    engine.refresh()
+    yield engine
+    engine.close()
+
+
+def test_avg_popularity_trends(engine):
+    # dim_artists uses each artist's latest row (a1: 70 from Apr 2) for every snapshot;
+    # a3 only exists as an enriched artist and a4 has no artist data at all
+    assert engine.mart("mart_avg_popularity_trends").fetchall() == [
+        (APR_2, pytest.approx((70 + 30) / 2), pytest.approx((70 + 50) / 2)),
+        (APR_1, pytest.approx((60 + 40 + 20 + 80) / 4), pytest.approx((70 + 50 + 10) / 3)),
+    ]
+
+
+def test_latest_track_vintages(engine):
+    # t4's release date does not parse, so it is left out of the totals
+    assert engine.mart("mart_latest_track_vintages").fetchall() == [
+        (APR_2, "2020s", 1, 2, pytest.approx(50.0)),
+        (APR_2, "2010s", 1, 2, pytest.approx(50.0)),
+        (APR_1, "2020s", 1, 3, pytest.approx(100 / 3)),
+        (APR_1, "1990s", 1, 3, pytest.approx(100 / 3)),
+        (APR_1, "Older or Unknown", 1, 3, pytest.approx(100 / 3)),
+    ]
+
+
+def test_latest_genre_distribution(engine):
+    # Top-artist rows win over enriched rows for the same artist ("ignored" never appears)
+    rows = sorted(engine.mart("mart_latest_genre_distribution").fetchall())
+    assert rows == [
+        (APR_1, "jazz", 1, 3, pytest.approx(100 / 3)),
+        (APR_1, "pop", 1, 3, pytest.approx(100 / 3)),
+        (APR_1, "rock", 1, 3, pytest.approx(100 / 3)),
+        (APR_2, "pop", 1, 2, pytest.approx(50.0)),
+        (APR_2, "rock", 1, 2, pytest.approx(50.0)),
+    ]
+
+
+def test_refresh_is_incremental_and_evicts_deleted_files(engine, raw_dir):
+    assert engine.refresh() == 0
+
+    os.remove(raw_dir / "enriched_artists" / "year=2025" / "month=04" / "day=01" / "enriched_artists_20250401_061000.json")
+    assert engine.refresh() == 1
+
+    genres = {genre for _, genre, *_ in engine.mart("mart_latest_genre_distribution").fetchall()}
+    assert "jazz" not in genres
@@ -25,6 +25,7 @@ SECRET_VERSION = "latest" # Use the latest version of the secret
 SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
 SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
 TIME_RANGE = "short_term" 
+VALID_TIME_RANGES = ["short_term", "medium_term", "long_term"]
 LIMIT = 10
 
 # Initialize clients globally to potentially reuse connections
@@ -71,16 +72,16 @@ def refresh_spotify_access_token(client_id, client_secret, refresh_token):
             print(f"Response text: {response.text}")
         raise RuntimeError("Failed to refresh Spotify token") from e
     
-def fetch_spotify_top_items(access_token, item_type):
+def fetch_spotify_top_items(access_token, item_type, time_range=TIME_RANGE):
     """Fetches top tracks or artists for the authenticated user."""
     if item_type not in ["tracks", "artists"]:
         raise ValueError("item_type must be 'tracks' or 'artists'")
 
     api_url = f"{SPOTIFY_API_BASE_URL}/me/top/{item_type}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"time_range": TIME_RANGE, "limit": LIMIT}
+    params = {"time_range": time_range, "limit": LIMIT}
 
-    print(f"Fetching top {item_type} ({TIME_RANGE}, limit {LIMIT})...")
+    print(f"Fetching top {item_type} ({time_range}, limit {LIMIT})...")
     try:
         response = requests.get(api_url, headers=headers, params=params, timeout=10)
         response.raise_for_status()
@@ -165,6 +166,11 @@ def spotify_ingest_http(request):
     print("Spotify ingestion function triggered.")
     run_timestamp = datetime.now()
 
+    # Orchestrators fan out one call per time range, e.g. ?time_range=medium_term
+    time_range = request.args.get("time_range", TIME_RANGE) if request is not None else TIME_RANGE
+    if time_range not in VALID_TIME_RANGES:
+        return (f"Error: time_range must be one of {VALID_TIME_RANGES}", 400)
+
     try:
         # 1. Get Credentials from Secret Manager
         print("Fetching Spotify credentials...")
@@ -186,23 +192,26 @@ def spotify_ingest_http(request):
         year = run_timestamp.strftime('%Y')
         month = run_timestamp.strftime('%m') 
         day = run_timestamp.strftime('%d')  
-        base_gcs_path_tracks = f"spotify/raw/tracks/year={year}/month={month}/day={day}"
-        base_gcs_path_artists = f"spotify/raw/artists/year={year}/month={month}/day={day}"
+        # Only the default range feeds the raw_spotify_* external tables; other ranges
+        # land under their own prefix so they don't double up the staging snapshots
+        raw_prefix = "spotify/raw" if time_range == TIME_RANGE else f"spotify/raw/{time_range}"
+        base_gcs_path_tracks = f"{raw_prefix}/tracks/year={year}/month={month}/day={day}"
+        base_gcs_path_artists = f"{raw_prefix}/artists/year={year}/month={month}/day={day}"
         timestamp_suffix = run_timestamp.strftime('%Y%m%d_%H%M%S')
 
         # 3. Fetch Playlist Data from Spotify API
         # --- Fetch and Upload Top Tracks ---
         try:
-            top_tracks_data = fetch_spotify_top_items(access_token, "tracks")
-            tracks_blob_name = f"{base_gcs_path_tracks}/top_tracks_{TIME_RANGE}_{timestamp_suffix}.json"
+            top_tracks_data = fetch_spotify_top_items(access_token, "tracks", time_range)
+            tracks_blob_name = f"{base_gcs_path_tracks}/top_tracks_{time_range}_{timestamp_suffix}.json"
             upload_to_gcs(GCS_BUCKET_NAME, tracks_blob_name, top_tracks_data)
         except Exception as e:
             print(f"Failed to process top tracks: {e}")
 
         # --- Fetch and Upload Top Artists ---
         try:
-            top_artists_data = fetch_spotify_top_items(access_token, "artists")
-            artists_blob_name = f"{base_gcs_path_artists}/top_artists_{TIME_RANGE}_{timestamp_suffix}.json"
+            top_artists_data = fetch_spotify_top_items(access_token, "artists", time_range)
+            artists_blob_name = f"{base_gcs_path_artists}/top_artists_{time_range}_{timestamp_suffix}.json"
             upload_to_gcs(GCS_BUCKET_NAME, artists_blob_name, top_artists_data)
         except Exception as e:
             print(f"Failed to process top artists: {e}")
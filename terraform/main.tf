@@ -295,6 +295,13 @@ resource "google_storage_bucket_iam_member" "enrich_gcs_viewer" {
   member = "serviceAccount:${google_service_account.enrich_artists_sa.email}"
 }
 
+# Grant Enrichment SA permission to land raw /artists responses in the GCS bucket
+resource "google_storage_bucket_iam_member" "enrich_gcs_writer" {
+  bucket = google_storage_bucket.data_lake.name
+  role   = "roles/storage.objectCreator"
+  member = "serviceAccount:${google_service_account.enrich_artists_sa.email}"
+}
+
 # --- Cloud Function Definition ---
 
 resource "google_cloudfunctions2_function" "enrich_artists_function" {
@@ -321,6 +328,7 @@ resource "google_cloudfunctions2_function" "enrich_artists_function" {
     # Environment variables needed by the enrichment function's Python code
     environment_variables = {
       GCP_PROJECT_ID       = var.project_id
+      GCS_BUCKET_NAME      = google_storage_bucket.data_lake.name
       BQ_DATASET_ID        = google_bigquery_dataset.data_warehouse.dataset_id
       DIM_ARTISTS_TABLE_ID = "dim_artists"
       STG_TRACKS_TABLE_ID  = "stg_top_tracks"
@@ -351,6 +359,114 @@ resource "google_cloud_run_service_iam_member" "enrich_invoker" {
 }
 
 
+
+# --- SPOTIFY ENRICH AUDIO FEATURES FUNCTION ---
+# --- Cloud Function Service Account and Permissions ---
+
+# Service Account for the Audio Features Enrichment Function
+resource "google_service_account" "enrich_audio_features_sa" {
+  account_id   = "enrich-audio-features-sa"
+  display_name = "Service Account for Audio Features Enrichment Function"
+  project      = var.project_id
+}
+
+# Grant Audio Features SA permission to access Spotify secrets
+resource "google_secret_manager_secret_iam_member" "audio_features_spotify_client_id_accessor" {
+  project   = google_secret_manager_secret.spotify_client_id.project
+  secret_id = google_secret_manager_secret.spotify_client_id.secret_id
+  role      = "roles/secretmanager.secretAccessor"
+  member    = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+resource "google_secret_manager_secret_iam_member" "audio_features_spotify_client_secret_accessor" {
+  project   = google_secret_manager_secret.spotify_client_secret.project
+  secret_id = google_secret_manager_secret.spotify_client_secret.secret_id
+  role      = "roles/secretmanager.secretAccessor"
+  member    = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+resource "google_secret_manager_secret_iam_member" "audio_features_spotify_refresh_token_accessor" {
+  project   = google_secret_manager_secret.spotify_refresh_token.project
+  secret_id = google_secret_manager_secret.spotify_refresh_token.secret_id
+  role      = "roles/secretmanager.secretAccessor"
+  member    = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+# Grant Audio Features SA permission to read/write BigQuery dataset (for reading staging/writing the feature mirror)
+resource "google_bigquery_dataset_iam_member" "audio_features_bq_editor" {
+  project    = var.project_id
+  dataset_id = google_bigquery_dataset.data_warehouse.dataset_id
+  role       = "roles/bigquery.dataEditor"
+  member     = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+# Grant Audio Features SA permission to run BigQuery jobs in the project
+resource "google_project_iam_member" "audio_features_bq_job_user" {
+  project = var.project_id
+  role    = "roles/bigquery.user"
+  member  = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+# Grant Audio Features SA permission to read and overwrite GCS objects (BQ external tables + feature store mirror)
+resource "google_storage_bucket_iam_member" "audio_features_gcs_user" {
+  bucket = google_storage_bucket.data_lake.name
+  role   = "roles/storage.objectUser"
+  member = "serviceAccount:${google_service_account.enrich_audio_features_sa.email}"
+}
+
+# --- Cloud Function Definition ---
+
+resource "google_cloudfunctions2_function" "enrich_audio_features_function" {
+  name     = "enrich-audio-features-function"
+  location = var.region
+  project  = var.project_id
+
+  build_config {
+    runtime     = "python310"
+    entry_point = "enrich_audio_features_http"
+    source {
+      storage_source {
+        bucket = google_storage_bucket.data_lake.name
+        object = "tf-sources/placeholder.zip"
+      }
+    }
+  }
+
+  service_config {
+    max_instance_count = 1
+    min_instance_count = 0
+    available_memory   = "512Mi" # Feature store is memory-mapped from /tmp, which counts against memory
+    timeout_seconds    = 180
+    environment_variables = {
+      GCP_PROJECT_ID          = var.project_id
+      GCS_BUCKET_NAME         = google_storage_bucket.data_lake.name
+      BQ_DATASET_ID           = google_bigquery_dataset.data_warehouse.dataset_id
+      STG_TRACKS_TABLE_ID     = "stg_top_tracks"
+      AUDIO_FEATURES_TABLE_ID = "dim_track_audio_features"
+    }
+    service_account_email          = google_service_account.enrich_audio_features_sa.email
+    ingress_settings               = "ALLOW_ALL" # Public trigger for Kestra/testing
+    all_traffic_on_latest_revision = true
+  }
+
+  depends_on = [
+    google_secret_manager_secret.spotify_client_id,
+    google_secret_manager_secret.spotify_client_secret,
+    google_secret_manager_secret.spotify_refresh_token,
+  ]
+}
+
+# Grant public access to invoke the audio features function's underlying service
+resource "google_cloud_run_service_iam_member" "enrich_audio_features_invoker" {
+  location = google_cloudfunctions2_function.enrich_audio_features_function.location
+  project  = google_cloudfunctions2_function.enrich_audio_features_function.project
+  service  = google_cloudfunctions2_function.enrich_audio_features_function.name
+  role     = "roles/run.invoker"
+  member   = "allUsers"
+
+  depends_on = [google_cloudfunctions2_function.enrich_audio_features_function]
+}
+
 # --- BigQuery External Table for Raw Spotify Top Tracks ---
 
 resource "google_bigquery_table" "raw_spotify_top_tracks" {
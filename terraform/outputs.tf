@@ -0,0 +1,16 @@
+# --- Function URLs consumed by the Kestra flows (kestra/.env) ---
+
+output "spotify_ingest_url" {
+  description = "HTTPS trigger URL of the Spotify ingestion function"
+  value       = google_cloudfunctions2_function.spotify_ingest_function.service_config[0].uri
+}
+
+output "enrich_artists_url" {
+  description = "HTTPS trigger URL of the artist enrichment function"
+  value       = google_cloudfunctions2_function.enrich_artists_function.service_config[0].uri
+}
+
+output "enrich_audio_features_url" {
+  description = "HTTPS trigger URL of the audio features enrichment function"
+  value       = google_cloudfunctions2_function.enrich_audio_features_function.service_config[0].uri
+}